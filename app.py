@@ -1,10 +1,22 @@
+import atexit
+import csv
+import functools
+import io
 import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 import requests
-from flask import Flask, render_template, request, jsonify
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+from cachetools import TTLCache
+from flask import Flask, Response, render_template, request
 from dotenv import load_dotenv
-import xml.etree.ElementTree as ET
+from lxml import etree as ET
 from datetime import datetime, timedelta
-import pytz
+from zoneinfo import ZoneInfo
 import logging
 
 # Configure logging
@@ -18,6 +30,66 @@ load_dotenv()
 
 app = Flask(__name__)
 
+# Charge Anywhere endpoints, all served from one host so they share a pool
+API_BASE_URL = "https://webtest.chargeanywhere.com"
+MERCHANT_UPDATE_URL = f"{API_BASE_URL}/PartnerPortalAPI/PartnerPortalAPI.asmx?WSDL"
+BATCH_EXPORT_URL = f"{API_BASE_URL}/apis/Transactions_Export.aspx"
+TRANSACTION_URL = f"{API_BASE_URL}/apis/api/Transaction"
+
+
+# TCP keepalive probes start after 30s idle, below typical server keep-alive
+# timeouts, so dead pooled connections are found within about a minute.
+# The timing options are platform specific, so only the available ones are set.
+KEEPALIVE_SOCKET_OPTIONS = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)] + [
+    (socket.IPPROTO_TCP, getattr(socket, name), value)
+    for name, value in (("TCP_KEEPIDLE", 30), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3))
+    if hasattr(socket, name)
+]
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled sockets use TCP keepalive and no Nagle delay"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = (
+            HTTPConnection.default_socket_options + KEEPALIVE_SOCKET_OPTIONS
+        )
+        super().init_poolmanager(*args, **kwargs)
+
+
+# Background workers for speculative batch export downloads
+PREFETCH_WORKERS = 4
+PREFETCH_EXECUTOR = ThreadPoolExecutor(
+    max_workers=PREFETCH_WORKERS, thread_name_prefix="batch-export-prefetch"
+)
+
+# Shared HTTP session so calls to the Charge Anywhere host reuse pooled
+# keep-alive connections instead of a new TCP/TLS handshake per request.
+# The pool is sized for the Gunicorn request threads plus the prefetch
+# workers, which all share it.
+SESSION = requests.Session()
+SESSION.headers.update({"User-Agent": "charge-anywhere-tools"})
+SESSION.mount(
+    API_BASE_URL,
+    KeepAliveAdapter(
+        pool_connections=4,
+        pool_maxsize=int(os.getenv("GUNICORN_THREADS", "32")) + PREFETCH_WORKERS,
+        pool_block=False,
+        # Every call is a non-idempotent POST, so only connection errors are
+        # retried; 5xx responses are never replayed
+        max_retries=Retry(total=2, backoff_factor=0.2),
+    ),
+)
+atexit.register(SESSION.close)
+
+# Batch export indexes ({identification: (emid, terminal_id)}) keyed by the
+# (date_from, date_to) window, shared between requests for a few minutes
+BATCH_INDEX_CACHE = TTLCache(maxsize=4, ttl=300)
+BATCH_INDEX_LOCK = threading.Lock()
+
+# Pre-serialized health check payload
+HEALTH_RESPONSE_BODY = b'{"status":"healthy"}'
+
 # Country mapping
 COUNTRIES = {
     "US": {"code": "840", "name": "United States"},
@@ -25,72 +97,63 @@ COUNTRIES = {
     "AU": {"code": "036", "name": "Australia"},
 }
 
+# New York timezone for batch export dates
+NY_TIMEZONE = ZoneInfo("America/New_York")
 
-def get_ny_timezone():
-    """Get New York timezone"""
-    return pytz.timezone("America/New_York")
-
-
-def format_ny_date(date_obj):
-    """Format date in NY timezone as mm/dd/yyyy"""
-    ny_tz = get_ny_timezone()
-    ny_time = date_obj.astimezone(ny_tz)
-    return ny_time.strftime("%m/%d/%Y")
+# API credentials, validated once at startup so a missing variable fails fast
+REQUIRED_CREDENTIALS = (
+    "CHANNEL_NAME",
+    "USERNAME",
+    "PASSWORD",
+    "CLIENT_KEY",
+    "CLIENT_SECRET",
+)
 
 
-def get_ny_dates():
-    """Get current NY date and yesterday's NY date for batch export"""
-    ny_tz = get_ny_timezone()
-    now_utc = datetime.now(pytz.UTC)
-    now_ny = now_utc.astimezone(ny_tz)
-
-    # Current day in NY timezone
-    today_ny = now_ny.date()
-
-    # Yesterday in NY timezone
-    yesterday_ny = today_ny - timedelta(days=1)
-    tomorrow_ny = today_ny + timedelta(days=1)
-
-    return {
-        "date_from": format_ny_date(
-            datetime.combine(yesterday_ny, datetime.min.time()).replace(tzinfo=ny_tz)
-        ),
-        "date_to": format_ny_date(
-            datetime.combine(tomorrow_ny, datetime.min.time()).replace(tzinfo=ny_tz)
-        ),
-    }
+def _validate_credentials():
+    """Raise at startup if any required credential is unset or empty"""
+    missing = [name for name in REQUIRED_CREDENTIALS if not os.getenv(name)]
+    if missing:
+        raise RuntimeError(
+            f"Missing required credentials in .env file: {', '.join(missing)}"
+        )
 
 
-def create_soap_request(merchant_id, country_code):
-    """Create SOAP XML request for merchant update"""
-    logger.info(
-        f"Creating SOAP request for merchant {merchant_id} with country code {country_code}"
-    )
+_validate_credentials()
 
-    # Get credentials from environment
-    channel_name = os.getenv("CHANNEL_NAME")
-    username = os.getenv("USERNAME")
-    password = os.getenv("PASSWORD")
+CHANNEL_NAME = os.environ["CHANNEL_NAME"]
+USERNAME = os.environ["USERNAME"]
+PASSWORD = os.environ["PASSWORD"]
+CLIENT_KEY = os.environ["CLIENT_KEY"]
+CLIENT_SECRET = os.environ["CLIENT_SECRET"]
 
-    if not all([channel_name, username, password]):
-        raise ValueError("Missing required credentials in .env file")
+# Charge Anywhere XML namespace and the merchant update SOAP headers
+CA_NAMESPACE = "http://www.chargeanywhere.com/"
+SOAP_HEADERS = {
+    "Content-Type": "text/xml; charset=utf-8",
+    "SOAPAction": f"{CA_NAMESPACE}Create_Update_MerchantInfo",
+}
 
-    # Build SOAP envelope
-    soap_envelope = f"""<?xml version="1.0" encoding="utf-8"?>
+# SOAP envelope for merchant updates, pre-encoded around the merchant ID and
+# country code so only those are filled in per request
+SOAP_ENVELOPE_HEAD = f"""<?xml version="1.0" encoding="utf-8"?>
 <soap12:Envelope xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:soap12="http://www.w3.org/2003/05/soap-envelope">
     <soap12:Body>
-        <Create_Update_MerchantInfo xmlns="http://www.chargeanywhere.com/">
+        <Create_Update_MerchantInfo xmlns="{CA_NAMESPACE}">
             <channelCredentials>
-                <ChannelName>{channel_name}</ChannelName>
-                <UserName>{username}</UserName>
-                <Password>{password}</Password>
+                <ChannelName>{CHANNEL_NAME}</ChannelName>
+                <UserName>{USERNAME}</UserName>
+                <Password>{PASSWORD}</Password>
             </channelCredentials>
             <merchantInfo xsi:type="ChargeAnyWhereMerchantInfo">
-                <MerchantId>{merchant_id}</MerchantId>
+                <MerchantId>""".encode()
+SOAP_ENVELOPE_COUNTRY = b"""</MerchantId>
                 <IndustryTypeId>0</IndustryTypeId>
                 <DuplicateCheck>0</DuplicateCheck>
-                <CountryCode>{country_code}</CountryCode>
-                <CurrencyCode>{country_code}</CurrencyCode>
+                <CountryCode>"""
+SOAP_ENVELOPE_CURRENCY = b"""</CountryCode>
+                <CurrencyCode>"""
+SOAP_ENVELOPE_TAIL = b"""</CurrencyCode>
                 <SettlementOptions>2</SettlementOptions>
                 <AutoSettle>1</AutoSettle>
                 <SettlementTime>0</SettlementTime>
@@ -102,29 +165,81 @@ def create_soap_request(merchant_id, country_code):
     </soap12:Body>
 </soap12:Envelope>"""
 
-    return soap_envelope
+# SOAP response elements, in Clark notation for iterparse tag filtering
+RESPONSE_CODE_TAG = f"{{{CA_NAMESPACE}}}ResponseCode"
+RESPONSE_TEXT_TAG = f"{{{CA_NAMESPACE}}}ResponseText"
+RESPONSE_TAGS = (RESPONSE_CODE_TAG, RESPONSE_TEXT_TAG)
 
 
-def parse_soap_response(response_text):
-    """Parse SOAP response and extract response code and text"""
-    try:
-        # Parse XML response
-        root = ET.fromstring(response_text)
+@functools.lru_cache(maxsize=2)
+def get_ny_dates_for(today_ny):
+    """Get the (date_from, date_to) batch export window around a NY date"""
+    # Yesterday and tomorrow in NY timezone, formatted as mm/dd/yyyy
+    return (
+        (today_ny - timedelta(days=1)).strftime("%m/%d/%Y"),
+        (today_ny + timedelta(days=1)).strftime("%m/%d/%Y"),
+    )
 
-        # Find the response elements using namespace
-        namespace = {
-            "soap": "http://www.w3.org/2003/05/soap-envelope",
-            "ca": "http://www.chargeanywhere.com/",
-        }
 
-        response_code = root.find(".//ca:ResponseCode", namespace)
-        response_text_elem = root.find(".//ca:ResponseText", namespace)
+def get_ny_dates():
+    """Get current NY date and yesterday's NY date for batch export"""
+    # The window only changes when the NY date rolls over, so it is cached;
+    # each caller gets its own dict so the cached value cannot be modified
+    date_from, date_to = get_ny_dates_for(datetime.now(NY_TIMEZONE).date())
+    return {"date_from": date_from, "date_to": date_to}
+
+
+def create_soap_request(merchant_id, country_code):
+    """Create SOAP XML request bytes for merchant update"""
+    logger.info(
+        "Creating SOAP request for merchant %s with country code %s",
+        merchant_id,
+        country_code,
+    )
+
+    # Fill the per-request fields into the pre-encoded SOAP envelope
+    country_code = country_code.encode()
+    return b"".join(
+        (
+            SOAP_ENVELOPE_HEAD,
+            merchant_id.encode(),
+            SOAP_ENVELOPE_COUNTRY,
+            country_code,
+            SOAP_ENVELOPE_CURRENCY,
+            country_code,
+            SOAP_ENVELOPE_TAIL,
+        )
+    )
+
 
-        if response_code is not None and response_text_elem is not None:
+def parse_soap_response(response_content):
+    """Parse SOAP response bytes and extract response code and text"""
+    try:
+        # Stream the XML response and stop once both elements have been read.
+        # Entity expansion and network access stay off, as with ElementTree.
+        found = {}
+        for _, elem in ET.iterparse(
+            io.BytesIO(response_content),
+            events=("end",),
+            tag=RESPONSE_TAGS,
+            resolve_entities=False,
+            no_network=True,
+        ):
+            found.setdefault(elem.tag, elem.text)
+
+            # Free the element and any already parsed siblings
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+            if len(found) == len(RESPONSE_TAGS):
+                break
+
+        if len(found) == len(RESPONSE_TAGS):
             return {
                 "success": True,
-                "response_code": response_code.text,
-                "response_text": response_text_elem.text,
+                "response_code": found[RESPONSE_CODE_TAG],
+                "response_text": found[RESPONSE_TEXT_TAG],
             }
         else:
             return {
@@ -140,105 +255,143 @@ def parse_soap_response(response_text):
         }
 
 
-def get_batch_export_data(terminal_id):
-    """Get batch export data to extract EMID and identification"""
-    logger.info(f"Calling batch export API for TID: {terminal_id}")
+def fetch_batch_export(ny_dates):
+    """Download the raw batch export CSV for a NY date window"""
+    # Prepare form data
+    form_data = {
+        "ClientKey": CLIENT_KEY,
+        "ClientSecret": CLIENT_SECRET,
+        "DateFrom": ny_dates["date_from"],
+        "DateTo": ny_dates["date_to"],
+        "Version": "1.7",
+        "Fields": "EMID,TerminalId,Identification",
+    }
 
-    try:
-        # Get credentials from environment
-        client_key = os.getenv("CLIENT_KEY")
-        client_secret = os.getenv("CLIENT_SECRET")
+    # Send request to batch export API
+    logger.info("POST request to: %s", BATCH_EXPORT_URL)
 
-        if not all([client_key, client_secret]):
-            raise ValueError("Missing CLIENT_KEY or CLIENT_SECRET in .env file")
+    response = SESSION.post(BATCH_EXPORT_URL, data=form_data, timeout=30)
 
-        # Get NY dates
-        ny_dates = get_ny_dates()
-        logger.info(
-            f"Using NY dates - From: {ny_dates['date_from']}, To: {ny_dates['date_to']}"
+    if response.status_code != 200:
+        raise Exception(f"Batch export API returned status code {response.status_code}")
+
+    logger.info("Batch export API call successful")
+    return response.content
+
+
+def index_batch_export(body):
+    """Index batch export CSV bytes by identification"""
+    batch_index = {}
+    lines_processed = 0
+
+    # Parse CSV: EMID,TerminalId,Identification (a stray byte must not fail
+    # the whole export, and a BOM must not end up in the first EMID)
+    text = body.decode("utf-8-sig", errors="replace")
+    for row in csv.reader(io.StringIO(text)):
+        if len(row) < 3:
+            continue  # Skip blank and invalid lines
+
+        emid = row[0].strip()
+        returned_terminal_id = row[1].strip()
+        identification = row[2].strip()
+        lines_processed += 1
+
+        logger.debug(
+            "Processing line %d: EMID=%s, TerminalId=%s, Identification=%s",
+            lines_processed,
+            emid,
+            returned_terminal_id,
+            identification,
         )
 
-        # Prepare form data
-        form_data = {
-            "ClientKey": client_key,
-            "ClientSecret": client_secret,
-            "DateFrom": ny_dates["date_from"],
-            "DateTo": ny_dates["date_to"],
-            "Version": "1.7",
-            "Fields": "EMID,TerminalId,Identification",
-        }
+        # Keep the first record seen for each identification
+        batch_index.setdefault(identification, (emid, returned_terminal_id))
 
-        # Send request to batch export API
-        export_url = "https://webtest.chargeanywhere.com/apis/Transactions_Export.aspx"
-        logger.info(f"POST request to: {export_url}")
+    logger.info("Indexed %d batch export lines", lines_processed)
+    return batch_index
 
-        response = requests.post(export_url, data=form_data, timeout=30)
 
-        if response.status_code != 200:
-            raise Exception(
-                f"Batch export API returned status code {response.status_code}"
-            )
+def load_batch_index(ny_dates, terminal_id=None):
+    """Get the batch export index for a NY date window, fetching it if needed"""
+    cache_key = (ny_dates["date_from"], ny_dates["date_to"])
 
-        logger.info("Batch export API call successful, parsing response")
+    # Concurrent callers for the same window wait for a single download
+    with BATCH_INDEX_LOCK:
+        batch_index = BATCH_INDEX_CACHE.get(cache_key)
 
-        # Parse response - it's CSV format
-        lines = response.text.strip().split("\n")
-        logger.debug(f"First few lines of response: {lines[:5]}")  # Debug output
-        if not lines:
-            raise Exception("No data returned from batch export")
+        # Refetch when the terminal is missing too, since a cached export may
+        # predate the batch that is open now
+        if batch_index is not None and (
+            terminal_id is None or terminal_id in batch_index
+        ):
+            logger.info("Using cached batch export")
+            return batch_index
 
-        # Iterate through all lines to find matching TID
-        matching_record = None
-        lines_processed = 0
+        body = fetch_batch_export(ny_dates)
 
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
+        # Skip parsing an export that cannot contain the terminal at all
+        if terminal_id is not None and terminal_id.encode() not in body:
+            logger.info("TID %s does not appear in the batch export", terminal_id)
+            return batch_index or {}
 
-            # Parse CSV: EMID,TerminalId,Identification
-            parts = line.split(",")
-            if len(parts) < 3:
-                continue  # Skip invalid lines
+        batch_index = index_batch_export(body)
+        BATCH_INDEX_CACHE[cache_key] = batch_index
+        return batch_index
 
-            emid = parts[0].strip()
-            returned_terminal_id = parts[1].strip()
-            identification = parts[2].strip()
-            lines_processed += 1
 
-            logger.debug(
-                f"Processing line {lines_processed}: EMID={emid}, TerminalId={returned_terminal_id}, Identification={identification}"
-            )
+def log_prefetch_failure(future):
+    """Log a failed speculative batch export download"""
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("Batch export prefetch failed: %s", future.exception())
 
-            # Check if identification matches the terminal ID provided by user
-            if identification == terminal_id:
-                logger.info(f"Found matching record for TID {terminal_id}")
-                matching_record = {
-                    "emid": emid,
-                    "terminal_id": returned_terminal_id,
-                    "identification": identification,
-                }
-                break
 
-        if matching_record is None:
+def get_batch_export_data(terminal_id):
+    """Get batch export data to extract EMID and identification"""
+    logger.info("Calling batch export API for TID: %s", terminal_id)
+
+    try:
+        # Get NY dates
+        ny_dates = get_ny_dates()
+        logger.info(
+            "Using NY dates - From: %s, To: %s",
+            ny_dates["date_from"],
+            ny_dates["date_to"],
+        )
+
+        batch_index = load_batch_index(ny_dates, terminal_id)
+
+        # Check if identification matches the terminal ID provided by user
+        if terminal_id not in batch_index:
             logger.error(
-                f"No matching record found for TID: {terminal_id} after processing {lines_processed} lines"
+                "No matching record found for TID: %s in %d indexed records",
+                terminal_id,
+                len(batch_index),
             )
             raise Exception(f"No matching record found for TID: {terminal_id}")
 
+        logger.info("Found matching record for TID %s", terminal_id)
+        emid, returned_terminal_id = batch_index[terminal_id]
+        matching_record = {
+            "emid": emid,
+            "terminal_id": returned_terminal_id,
+            "identification": terminal_id,
+        }
+
         logger.info(
-            f"Successfully retrieved batch data: EMID={matching_record['emid']}, TerminalId={matching_record['terminal_id']}"
+            "Successfully retrieved batch data: EMID=%s, TerminalId=%s",
+            matching_record["emid"],
+            matching_record["terminal_id"],
         )
         return matching_record
 
     except Exception as e:
-        logger.error(f"Batch export failed: {str(e)}")
+        logger.error("Batch export failed: %s", e)
         raise Exception(f"Batch export failed: {str(e)}")
 
 
 def close_batch(emid, terminal_id, identification):
     """Close the batch using the Transaction API"""
-    logger.info(f"Calling close batch API for EMID: {emid}, TID: {terminal_id}")
+    logger.info("Calling close batch API for EMID: %s, TID: %s", emid, terminal_id)
 
     try:
         # Prepare JSON payload
@@ -251,13 +404,14 @@ def close_batch(emid, terminal_id, identification):
         }
 
         # Send request to transaction API
-        api_url = "https://webtest.chargeanywhere.com/apis/api/Transaction"
         headers = {"Content-Type": "application/json"}
 
-        logger.info(f"POST request to: {api_url}")
-        logger.info(f"Payload: {payload}")
+        logger.info("POST request to: %s", TRANSACTION_URL)
+        logger.info("Payload: %s", payload)
 
-        response = requests.post(api_url, json=payload, headers=headers, timeout=30)
+        response = SESSION.post(
+            TRANSACTION_URL, json=payload, headers=headers, timeout=30
+        )
 
         if response.status_code != 200:
             raise Exception(
@@ -270,7 +424,7 @@ def close_batch(emid, terminal_id, identification):
         response_text = result.get("ResponseText", "")
 
         logger.info(
-            f"Close batch response - Code: {response_code}, Text: {response_text}"
+            "Close batch response - Code: %s, Text: %s", response_code, response_text
         )
 
         return {
@@ -280,10 +434,15 @@ def close_batch(emid, terminal_id, identification):
         }
 
     except Exception as e:
-        logger.error(f"Close batch failed: {str(e)}")
+        logger.error("Close batch failed: %s", e)
         raise Exception(f"Close batch failed: {str(e)}")
 
 
+def json_response(data, status=200):
+    """Build a JSON response serialized with orjson"""
+    return Response(orjson.dumps(data), status=status, mimetype="application/json")
+
+
 @app.route("/")
 def index():
     """Main page with form"""
@@ -303,20 +462,26 @@ def update_country():
         country_key = request.form.get("country", "").strip()
 
         logger.info(
-            f"Request data - MID: {merchant_id}, TID: {terminal_id}, Country: {country_key}"
+            "Request data - MID: %s, TID: %s, Country: %s",
+            merchant_id,
+            terminal_id,
+            country_key,
         )
 
         # Validate inputs
         if not merchant_id:
-            return jsonify({"success": False, "error": "Merchant ID is required"}), 400
+            return json_response(
+                {"success": False, "error": "Merchant ID is required"}, 400
+            )
 
         if not terminal_id:
-            return jsonify({"success": False, "error": "Terminal ID is required"}), 400
+            return json_response(
+                {"success": False, "error": "Terminal ID is required"}, 400
+            )
 
         if country_key not in COUNTRIES:
-            return (
-                jsonify({"success": False, "error": "Invalid country selection"}),
-                400,
+            return json_response(
+                {"success": False, "error": "Invalid country selection"}, 400
             )
 
         country_code = COUNTRIES[country_key]["code"]
@@ -324,25 +489,27 @@ def update_country():
         # Create SOAP request
         soap_request = create_soap_request(merchant_id, country_code)
 
-        # Send request to API
-        headers = {
-            "Content-Type": "text/xml; charset=utf-8",
-            "SOAPAction": "http://www.chargeanywhere.com/Create_Update_MerchantInfo",
-        }
-
-        api_url = "https://webtest.chargeanywhere.com/PartnerPortalAPI/PartnerPortalAPI.asmx?WSDL"
+        # Start loading the batch export while the update runs, so it is
+        # usually cached already if the update fails with code 175. Unless
+        # the window is already cached, this downloads the export on every
+        # update, successful or not.
+        prefetch = PREFETCH_EXECUTOR.submit(load_batch_index, get_ny_dates())
+        prefetch.add_done_callback(log_prefetch_failure)
 
-        logger.info(f"Calling merchant update API: {api_url}")
+        # Send request to API
+        logger.info("Calling merchant update API: %s", MERCHANT_UPDATE_URL)
 
-        response = requests.post(
-            api_url, data=soap_request, headers=headers, timeout=30
+        response = SESSION.post(
+            MERCHANT_UPDATE_URL, data=soap_request, headers=SOAP_HEADERS, timeout=30
         )
 
         # Parse response
-        result = parse_soap_response(response.text)
+        result = parse_soap_response(response.content)
 
         logger.info(
-            f"Initial API response - Code: {result['response_code']}, Text: {result['response_text']}"
+            "Initial API response - Code: %s, Text: %s",
+            result["response_code"],
+            result["response_text"],
         )
 
         # Check if we got error code 175 (open batch exists)
@@ -370,22 +537,27 @@ def update_country():
                     batch_closed = True
                     logger.info("Batch closed successfully. Retrying merchant update.")
                     # Retry the original country update
-                    retry_response = requests.post(
-                        api_url, data=soap_request, headers=headers, timeout=30
+                    retry_response = SESSION.post(
+                        MERCHANT_UPDATE_URL,
+                        data=soap_request,
+                        headers=SOAP_HEADERS,
+                        timeout=30,
                     )
-                    result = parse_soap_response(retry_response.text)
+                    result = parse_soap_response(retry_response.content)
                     logger.info(
-                        f"Retry API response - Code: {result['response_code']}, Text: {result['response_text']}"
+                        "Retry API response - Code: %s, Text: %s",
+                        result["response_code"],
+                        result["response_text"],
                     )
                 else:
                     batch_close_error = f"Batch close failed: {close_result['response_code']} - {close_result['response_text']}"
-                    logger.error(f"Batch close failed: {batch_close_error}")
+                    logger.error("Batch close failed: %s", batch_close_error)
 
             except Exception as e:
                 batch_close_error = str(e)
-                logger.error(f"Batch closing process failed: {batch_close_error}")
+                logger.error("Batch closing process failed: %s", batch_close_error)
 
-            return jsonify(
+            return json_response(
                 {
                     "success": True,
                     "merchant_id": merchant_id,
@@ -401,7 +573,10 @@ def update_country():
 
         # Normal response (not error code 175)
         logger.info("No batch closing needed - normal response")
-        return jsonify(
+
+        # Only skips the download if no prefetch worker has picked it up yet
+        prefetch.cancel()
+        return json_response(
             {
                 "success": True,
                 "merchant_id": merchant_id,
@@ -414,22 +589,19 @@ def update_country():
         )
 
     except requests.RequestException as e:
-        logger.error(f"API request failed: {str(e)}")
-        return (
-            jsonify({"success": False, "error": f"API request failed: {str(e)}"}),
-            500,
+        logger.error("API request failed: %s", e)
+        return json_response(
+            {"success": False, "error": f"API request failed: {str(e)}"}, 500
         )
     except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
-        return jsonify({"success": False, "error": f"Unexpected error: {str(e)}"}), 500
+        logger.error("Unexpected error: %s", e)
+        return json_response(
+            {"success": False, "error": f"Unexpected error: {str(e)}"}, 500
+        )
 
 
 @app.route("/health")
 def health():
     """Health check endpoint"""
-    logger.info("Health check endpoint called")
-    return jsonify({"status": "healthy"})
-
-
-if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=5000)
+    # Probed every few seconds, so skip logging and JSON serialization
+    return Response(HEALTH_RESPONSE_BODY, mimetype="application/json")
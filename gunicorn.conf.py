@@ -0,0 +1,19 @@
+"""
+Gunicorn configuration for the Charge Anywhere Country Change Tool
+"""
+
+import os
+
+# Bind to the same port as the development server
+bind = os.getenv("BIND", "0.0.0.0:5000")
+
+# Threaded workers: requests spend most of their time waiting on the
+# Charge Anywhere APIs, so the threads supply the concurrency. Each worker
+# process keeps its own batch export cache and connection pool, so the
+# worker count stays small and fixed rather than following the host's CPUs.
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "32"))
+
+accesslog = "-"
+errorlog = "-"
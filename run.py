@@ -9,7 +9,16 @@ import sys
 
 def check_dependencies():
     """Check if required dependencies are installed"""
-    required_modules = ["flask", "requests", "dotenv"]
+    required_modules = [
+        "flask",
+        "requests",
+        "dotenv",
+        "lxml",
+        "cachetools",
+        "orjson",
+    ]
+    if os.name != "nt":
+        required_modules.append("gunicorn")
     missing_modules = []
 
     for module in required_modules:
@@ -39,7 +48,13 @@ def check_env_file():
         return False
 
     # Check if required environment variables are set
-    required_vars = ["CHANNEL_NAME", "USERNAME", "PASSWORD"]
+    required_vars = [
+        "CHANNEL_NAME",
+        "USERNAME",
+        "PASSWORD",
+        "CLIENT_KEY",
+        "CLIENT_SECRET",
+    ]
     with open(".env", "r") as f:
         env_content = f.read()
 
@@ -62,22 +77,46 @@ def main():
     # Check environment file
     check_env_file()
 
-    print("Starting Flask application...")
+    # Gunicorn needs fcntl, so Windows falls back to Flask's threaded server
+    use_gunicorn = os.name != "nt"
+    server_name = "Gunicorn" if use_gunicorn else "the threaded Flask server"
+
+    print(f"Starting Flask application with {server_name}...")
     print("Access the application at: http://localhost:5000")
     print("Press Ctrl+C to stop the server")
     print()
 
-    # Import and run the Flask app
+    # Import the Flask app first so configuration errors are reported here
     try:
         from app import app
-
-        app.run(debug=True, host="0.0.0.0", port=5000)
-    except KeyboardInterrupt:
-        print("\nServer stopped by user")
     except Exception as e:
         print(f"Error starting server: {e}")
         sys.exit(1)
 
+    if not use_gunicorn:
+        try:
+            app.run(host="0.0.0.0", port=5000, threaded=True)
+        except KeyboardInterrupt:
+            print("\nServer stopped by user")
+        return
+
+    # Hand the process over to Gunicorn (settings in gunicorn.conf.py),
+    # resolving the config and app next to this script rather than the cwd
+    here = os.path.dirname(os.path.abspath(__file__))
+    os.execvp(
+        sys.executable,
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--config",
+            os.path.join(here, "gunicorn.conf.py"),
+            "--chdir",
+            here,
+            "app:app",
+        ],
+    )
+
 
 if __name__ == "__main__":
     main()